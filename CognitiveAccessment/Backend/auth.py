@@ -1,45 +1,78 @@
-import bcrypt
 import jwt
 import datetime
+import hashlib
+import hmac
+import logging
+import time
 import os
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import secrets
 from database import supabase
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY", "your_jwt_secret")
 ALGORITHM = "HS256"
 SESSION_EXPIRY_DAYS = 7
+JWT_CACHE_TTL_SECONDS = 5
+SESSION_CACHE_TTL_SECONDS = 60
+
+# Recently verified tokens, keyed by a short digest of the token -> (user_id, exp)
+_JWT_CACHE = TTLCache(maxsize=10_000, ttl=JWT_CACHE_TTL_SECONDS)
 
-# Generate a hashed session ID
-def hash_session_id(session_id: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(session_id.encode(), salt).decode()
+# Recently verified sessions, session_id -> (user_id, expires_at), so repeated
+# requests from the same session skip the Sessions lookup
+_SESSION_CACHE = TTLCache(maxsize=10_000, ttl=SESSION_CACHE_TTL_SECONDS)
+
+# Parse a PostgREST timestamp. PostgREST drops trailing zeros from the fraction (".5",
+# ".1234"), which fromisoformat only accepts from Python 3.11, so pad it to microseconds
+def parse_timestamp(value: str) -> datetime.datetime:
+    head, dot, fraction = value.partition(".")
+    if dot:
+        digits = len(fraction) - len(fraction.lstrip("0123456789"))
+        value = f"{head}.{fraction[:digits][:6].ljust(6, '0')}{fraction[digits:]}"
+    return datetime.datetime.fromisoformat(value)
 
 # Verify if a session ID is valid
-def verify_session(session_id: str, user_id: str) -> bool:  
-    response = supabase.table("Sessions").select("session_id, expires_at").eq("user_id", user_id).execute()  
+async def verify_session(session_id: str, user_id: str) -> bool:  
+    cached = _SESSION_CACHE.get(session_id)
+    if cached is not None:
+        cached_user_id, expires_at = cached
+        if cached_user_id == user_id and datetime.datetime.utcnow() <= expires_at:
+            return True
+        _SESSION_CACHE.pop(session_id, None)
+
+    response = await supabase.table("Sessions").select("session_id, expires_at").eq("user_id", user_id).execute()  
 
     if not response.data:  
-        print("No session found for user_id:", user_id)  
+        logger.debug("No session found for user_id: %s", user_id)
         return False  # No session found  
 
     session_data = response.data[0]  
-    stored_hashed_session = session_data["session_id"]  
-    expires_at = datetime.datetime.strptime(session_data["expires_at"], "%Y-%m-%dT%H:%M:%S.%f")  
+    stored_session = session_data["session_id"]  
+    expires_at = parse_timestamp(session_data["expires_at"])  
+    now = datetime.datetime.utcnow()
 
-    if datetime.datetime.utcnow() > expires_at:  
-        print("Session expired. Current time:", datetime.datetime.utcnow(), "Expires at:", expires_at)  
+    if now > expires_at:  
+        logger.debug("Session expired. Current time: %s Expires at: %s", now, expires_at)
         return False  # Session expired  
 
-    # Check if the session ID matches the stored hashed session  
-    is_valid = session_id == stored_hashed_session
+    # Check if the session ID matches the stored session (constant-time compare)  
+    is_valid = hmac.compare_digest(session_id.encode(), stored_session.encode())
     if not is_valid:  
-        print("Invalid session ID. Provided:", session_id, "Stored hash:", stored_hashed_session)  
+        logger.debug("Invalid session ID for user_id: %s", user_id)
+    else:
+        _SESSION_CACHE[session_id] = (user_id, expires_at)
 
     return is_valid  
 
+# Forget a cached session, e.g. on logout
+def invalidate_session(session_id: str):
+    _SESSION_CACHE.pop(session_id, None)
+
 # Generate JWT token
 def create_jwt(user_id: str):
     expiration = datetime.datetime.utcnow() + datetime.timedelta(days=SESSION_EXPIRY_DAYS)
@@ -48,10 +81,22 @@ def create_jwt(user_id: str):
 
 # Verify JWT token
 def verify_jwt(token: str):
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _JWT_CACHE.get(cache_key)
+    if cached is not None:
+        user_id, exp = cached
+        # A cached token can still expire within the cache TTL
+        if exp > time.time():
+            return user_id
+        _JWT_CACHE.pop(cache_key, None)
+        return None
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["user_id"]
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+
+    _JWT_CACHE[cache_key] = (payload["user_id"], payload["exp"])
+    return payload["user_id"]
@@ -1,5 +1,6 @@
-from supabase import create_client
+from postgrest import AsyncPostgrestClient
 from dotenv import load_dotenv
+import httpx
 import os
 
 load_dotenv()
@@ -10,6 +11,34 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 # print (SUPABASE_URL)
 # print (SUPABASE_KEY)
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Keep TLS connections to PostgREST alive between requests so bursts reuse them
+# instead of paying a fresh TCP + TLS handshake per query
+POSTGREST_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=64,
+    keepalive_expiry=30,
+)
+
+# Async PostgREST client so the endpoints don't block the event loop on DB calls
+class AsyncSupabaseClient(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=POSTGREST_LIMITS,
+        )
+
+supabase = AsyncSupabaseClient(
+    f"{SUPABASE_URL}/rest/v1",
+    headers={
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+    },
+)
 
 
@@ -1,30 +1,36 @@
 from fastapi import APIRouter, HTTPException, Depends
 from database import supabase
 import logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
 
-from auth import hash_session_id,verify_session, create_jwt, verify_jwt
+from auth import verify_session, invalidate_session, create_jwt, verify_jwt
 
 from models import StudentAnswer, UserSignup, UserLogin, Feedback
 
+import asyncio
 import secrets
 import datetime
 
 router = APIRouter()
 
+# Section a student moves on to after submitting the given one
+_SECTION_NEXT = {"A": "B", "B": "C", "C": "D"}
+
 #session validation
 @router.post("/session", response_model=dict)
 async def validate_session(session_id: str):
     try:
-        response = supabase.table("Sessions").select("session_id").eq("session_id", session_id).execute()
-        is_valid = len(response.data) > 0
+        # Only the row count is needed, so ask PostgREST for the count and no body
+        response = await supabase.table("Sessions").select("session_id", count="exact", head=True).eq("session_id", session_id).execute()
+        is_valid = (response.count or 0) > 0
         
         return {
             "valid": is_valid
         }
     except Exception as e:
         # Log the exception but return a clean response
-        print(f"Error validating session: {str(e)}")
+        logger.warning("Error validating session: %s", e)
         return {
             "valid": False
         }
@@ -32,112 +38,101 @@ async def validate_session(session_id: str):
 @router.post("/feedback", response_model=dict)
 async def submit_feedback(feedback: Feedback):
     try:
-        response = supabase.table("Feedback").insert({
+        response = await supabase.table("Feedback").insert({
             "name": feedback.name,
             "mobile": feedback.mobile,
             "email": feedback.email,
             "query": feedback.query
-        }).execute()
+        }, returning="minimal").execute()
 
         return {"success": True, "message": "Feedback submitted successfully"}
     except Exception as e:
-        print(f"Error submitting feedback: {str(e)}")
+        logger.warning("Error submitting feedback: %s", e)
         raise HTTPException(status_code=500, detail="Failed to submit feedback")
 
 #check if user has completed a  section from Student_Section_Time table
 @router.post("/section", response_model=dict)
 async def check_section_completion(user_id: str, section: str):
-    response = supabase.table("Student_Section_Time").select("*").eq("student_id", user_id).eq("section", section).execute()
+    # Only the row count is needed, so skip the response body
+    response = await supabase.table("Student_Section_Time").select("student_id", count="exact", head=True)\
+        .eq("student_id", user_id).eq("section", section).execute()
     
     return {
         "message": "Section completion status",
-        "completed": bool(response.data)
+        "completed": (response.count or 0) > 0
     }
 
 @router.post("/submit", response_model=dict)
 async def submit_answers(student_answer: StudentAnswer):
     try:
-        # Validate if the session exists
-        session_check = supabase.table("Sessions").select("session_id").eq("session_id", student_answer.sessionId).execute()
-        if not session_check.data:
-            raise HTTPException(status_code=404, detail="Session does not exist")
-        
         # Extract question IDs from the request
         question_numbers = [response.qNumber for response in student_answer.answers]
 
-        # Fetch correct answers for all given question numbers
-        response = supabase.table("Questions").select("question_id, correct_answer").in_("question_id", question_numbers).execute()
+        # Validate the session and fetch correct answers for all given question numbers concurrently
+        session_check, response = await asyncio.gather(
+            supabase.table("Sessions").select("session_id", count="exact", head=True).eq("session_id", student_answer.sessionId).execute(),
+            supabase.table("Questions").select("question_id, correct_answer").in_("question_id", question_numbers).execute()
+        )
+        if not session_check.count:
+            raise HTTPException(status_code=404, detail="Session does not exist")
+        
         question_data = {q["question_id"]: q["correct_answer"] for q in response.data}
         
         if not question_data:
             raise HTTPException(status_code=404, detail="Questions not found")
         
-        # Prepare bulk insert data for answers
-        insert_data = []
-        results = []
-
-        for answer in student_answer.answers:
-            if answer.qNumber not in question_data:
-                continue  # Skip if question not found
-            
-            is_correct = question_data[answer.qNumber] == answer.answer
-            
-            insert_data.append({
-                "answer_id": answer.qNumber,
-                "student_id": student_answer.userId,
-                "section": student_answer.section,
-                "question_id": answer.qNumber,
-                "selected_answer": answer.answer,
+        # Grade every answer in one pass, skipping questions that were not found
+        graded = [
+            (answer.qNumber, answer.answer, question_data[answer.qNumber] == answer.answer)
+            for answer in student_answer.answers
+            if answer.qNumber in question_data
+        ]
+
+        # Prepare bulk insert data for answers (student_id and section are filled in by submit_section)
+        insert_data = [
+            {
+                "answer_id": q_number,
+                "question_id": q_number,
+                "selected_answer": selected,
                 "is_correct": is_correct
-            })
-            
-            results.append({
-                "qNumber": answer.qNumber,
-                "is_correct": is_correct
-            })
+            }
+            for q_number, selected, is_correct in graded
+        ]
+        results = [
+            {"qNumber": q_number, "is_correct": is_correct}
+            for q_number, _, is_correct in graded
+        ]
         
         if not insert_data:
             raise HTTPException(status_code=400, detail="No valid answers to insert")
         
-        # Insert all answers in one go
-        insert_response = supabase.table("Student_Answers").insert(insert_data).execute()
-
-        # Record time taken for this section in Student_Section_Time table
-        time_data = {
-            "student_id": student_answer.userId,
-            "section": student_answer.section,
-            "time_spent_seconds": student_answer.timeTaken
-        }
-        time_response = supabase.table("Student_Section_Time").insert(time_data).execute()
+        # Insert the answers, record the time taken for this section and, for section D,
+        # mark the test completed once A, B and C are done, all in one transaction
+        # (see sql/submit_section.sql)
+        submit_response = await supabase.rpc("submit_section", {
+            "p_student_id": student_answer.userId,
+            "p_section": student_answer.section,
+            "p_time_spent": student_answer.timeTaken,
+            "p_answers": insert_data
+        }).execute()
+        submitted = submit_response.data
 
         # Determine current_section for the next step
-        section_order = {"A": "B", "B": "C", "C": "D"}
-        current_section = section_order.get(student_answer.section)
+        current_section = _SECTION_NEXT.get(student_answer.section)
 
-        # If the section is 'D', check if A, B, and C have been completed
         if student_answer.section == "D":
-            completed_sections = supabase.table("Student_Section_Time").select("section").eq("student_id", student_answer.userId).in_("section", ["A", "B", "C"]).execute()
-            completed_section_names = {s["section"] for s in completed_sections.data}
-
-            # If A, B, and C are all present, mark Test_Completed as true
-            if {"A", "B", "C"}.issubset(completed_section_names):
-                supabase.table("Test_Completed").upsert({
-                    "student_id": student_answer.userId,
-                    "completed": True
-                }).execute()
-            
             return {
                 "status": "success",
-                "inserted_count": len(insert_response.data),
+                "inserted_count": submitted["inserted_count"],
                 "results": results,
-                "time_recorded": bool(time_response.data)
+                "time_recorded": submitted["time_recorded"]
             }
 
         return {
             "status": "success",
-            "inserted_count": len(insert_response.data),
+            "inserted_count": submitted["inserted_count"],
             "results": results,
-            "time_recorded": bool(time_response.data),
+            "time_recorded": submitted["time_recorded"],
             "current_section": current_section
         }
     except HTTPException as he:
@@ -151,13 +146,14 @@ async def submit_answers(student_answer: StudentAnswer):
 
 @router.post("/signup", response_model=dict)
 async def signup(user: UserSignup):
-    logging.info(f"Received payload: {user.dict()}")
-    print(f"Received payload: {user.dict()}")
-    # Check if a user with the same name, mobile, and date_of_birth exists
-    existing_user = supabase.table("Users").select("*")\
-        .eq("name", user.name)\
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received payload: %s", user.model_dump())
+    # Check if a user with the same name (case-insensitive, as in login), mobile, and date_of_birth exists
+    existing_user = await supabase.table("Users").select("user_id")\
+        .eq("name_lower", user.name.lower())\
         .eq("mobile", user.mobile)\
         .eq("date_of_birth", user.date_of_birth)\
+        .limit(1)\
         .execute()
 
     if existing_user.data:
@@ -165,7 +161,7 @@ async def signup(user: UserSignup):
 
 
     # First, insert into Users table
-    user_response = supabase.table("Users").insert({
+    user_response = await supabase.table("Users").insert({
         "name": user.name,
         "age": user.age,
         "standard": user.standard,
@@ -178,65 +174,44 @@ async def signup(user: UserSignup):
     # Get the newly created user_id
     new_user_id = user_response.data[0]["user_id"]
     
-    # Then, insert into Students table
-    student_response = supabase.table("Students").insert({
+    # Then, insert into Students table (the row isn't read back, so skip returning it)
+    await supabase.table("Students").insert({
         "student_id": new_user_id,  # Use the same ID for consistency
         "name": user.name,
         "age": user.age,
         "grade_level": user.standard , # Assuming 'standard' is equivalent to 'grade_level'
         "state": user.state
-    }).execute()
+    }, returning="minimal").execute()
 
     return {
         "message": "User registered successfully",
         "user_id": new_user_id,
         "created_at": user_response.data[0]["created_at"],
-        "student_id": student_response.data[0]["student_id"]
+        "student_id": new_user_id
     }
 
 @router.post("/login", response_model=dict)
 async def login(user: UserLogin):
-    # Fetch user from Users table
-    db_user = supabase.table("Users").select("user_id, mobile, created_at, date_of_birth")\
-        .ilike("name", user.name).eq("mobile", user.mobile).eq("date_of_birth", user.date_of_birth).execute()
+    # Fetch the user, test status, completed sections and any active session in one round-trip
+    # (see sql/login_bundle.sql)
+    bundle = await supabase.rpc("login_bundle", {
+        "p_name": user.name,
+        "p_mobile": user.mobile,
+        "p_date_of_birth": user.date_of_birth
+    }).execute()
     
-    if not db_user.data:
+    if not bundle.data or not bundle.data["user"]:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    user_data = db_user.data[0]
+    user_data = bundle.data["user"]
     user_id = user_data["user_id"]
     date_of_birth = user_data["date_of_birth"]
-
-    # Check if user exists in Test_Completed table
-    test_status = supabase.table("Test_Completed").select("completed").eq("student_id", user_id).execute()
-    
-    if not test_status.data:
-        supabase.table("Test_Completed").insert({"student_id": user_id, "completed": False}).execute()
-        completed_status = False
-    else:
-        completed_status = test_status.data[0]["completed"]
-    
-    current_section = None
-    if not completed_status:
-        student_section = supabase.table("Student_Section_Time").select("section").eq("student_id", user_id).execute()
-        
-        if not student_section.data:
-            current_section = "A"
-        else:
-            sections = [entry["section"] for entry in student_section.data]
-            if "C" in sections:
-                current_section = "D"
-            elif "B" in sections:
-                current_section = "C"
-            elif "A" in sections:
-                current_section = "B"
+    completed_status = bundle.data["test_completed"]
     
-    # Check for existing active session
-    existing_session = supabase.table("Sessions").select("session_id, token")\
-        .eq("user_id", user_id).gt("expires_at", datetime.datetime.utcnow().isoformat()).execute()
+    current_section = bundle.data["current_section"]
     
-    if existing_session.data:
-        session_data = existing_session.data[0]
+    session_data = bundle.data["session"]
+    if session_data:
         response = {
             "message": "Already logged in",
             "token": session_data["token"],
@@ -255,23 +230,24 @@ async def login(user: UserLogin):
         return response
     
     # Create a new session
-    created_at = datetime.datetime.utcnow().isoformat()
-    session_id = secrets.token_hex(32)
-    hashed_session = hash_session_id(session_id)
+    now = datetime.datetime.utcnow()
+    created_at = now.isoformat()
+    # The session ID is an opaque random token; the client sends it back as-is
+    session_id = secrets.token_urlsafe(32)
     jwt_token = create_jwt(str(user_id))
     
-    supabase.table("Sessions").insert({
-        "session_id": hashed_session,
+    await supabase.table("Sessions").insert({
+        "session_id": session_id,
         "user_id": user_id,
         "token": jwt_token,
         "created_at": created_at,
-        "expires_at": (datetime.datetime.utcnow() + datetime.timedelta(days=7)).isoformat()
-    }).execute()
+        "expires_at": (now + datetime.timedelta(days=7)).isoformat()
+    }, returning="minimal").execute()
     
     response = {
         "message": "Login successful",
         "token": jwt_token,
-        "session_id": hashed_session,
+        "session_id": session_id,
         "user": {
             "user_id": user_id,
             "name": user.name,
@@ -289,12 +265,13 @@ async def login(user: UserLogin):
 
 @router.get("/protected", response_model=dict)
 async def protected_route(token: str, session_id: str, user_id: str):
+    # JWT verification is local CPU work, so skip the session lookup when it fails
     valid_jwt = verify_jwt(token)
-    valid_session = verify_session(session_id, user_id)
-
     if not valid_jwt :
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    elif not valid_session:
+
+    valid_session = await verify_session(session_id, user_id)
+    if not valid_session:
         raise HTTPException(status_code=401, detail="Invalid session")  
 
     return {
@@ -304,8 +281,8 @@ async def protected_route(token: str, session_id: str, user_id: str):
 
 @router.post("/logout", response_model=dict)
 async def logout(session_id: str):
-    
-    response = supabase.table("Sessions").delete().eq("session_id", session_id).execute()
+    invalidate_session(session_id)
+    response = await supabase.table("Sessions").delete().eq("session_id", session_id).execute()
 
     if not response.data:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1,8 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from endpoint import router
+from database import supabase
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-app = FastAPI(title="Assessment API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled Supabase connections on shutdown
+    await supabase.aclose()
+
+app = FastAPI(title="Assessment API", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(router, prefix="/api")
 
 
@@ -1,10 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+# Request bodies are read-only and must not carry unknown fields
+REQUEST_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True)
 
 class response_model(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     qNumber: int
     answer: int
 
 class StudentAnswer(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     userId: str
     sessionId: str
     section: str
@@ -12,6 +19,8 @@ class StudentAnswer(BaseModel):
     timeTaken: int
     
 class Feedback(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     name: str
     mobile: int
     email: str
@@ -19,6 +28,8 @@ class Feedback(BaseModel):
 
 
 class UserSignup(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     name: str
     age: int
     standard: int
@@ -27,6 +38,8 @@ class UserSignup(BaseModel):
     state: str
 
 class UserLogin(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     name: str
     mobile: int
     date_of_birth: str
\ No newline at end of file
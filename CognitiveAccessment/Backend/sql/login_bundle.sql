@@ -0,0 +1,66 @@
+-- Everything login() needs in a single round-trip: the matching user, their
+-- test status, the section they should continue from and any active session.
+-- Creates the Test_Completed row on first login.
+-- Needs the name_lower column from users_auth_index.sql.
+-- Called from endpoint.login via supabase.rpc("login_bundle", ...)
+
+create or replace function login_bundle(p_name text, p_mobile bigint, p_date_of_birth date)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_user record;
+    v_completed boolean;
+    v_sections text[];
+begin
+    select user_id, mobile, created_at, date_of_birth
+    into v_user
+    from "Users"
+    where name_lower = lower(p_name)
+      and mobile = p_mobile
+      and date_of_birth = p_date_of_birth
+    limit 1;
+
+    if not found then
+        return jsonb_build_object('user', null);
+    end if;
+
+    select completed into v_completed
+    from "Test_Completed"
+    where student_id = v_user.user_id;
+
+    if not found then
+        insert into "Test_Completed" (student_id, completed) values (v_user.user_id, false);
+        v_completed := false;
+    end if;
+
+    select array_agg(section) into v_sections
+    from "Student_Section_Time"
+    where student_id = v_user.user_id;
+
+    return jsonb_build_object(
+        'user', jsonb_build_object(
+            'user_id', v_user.user_id,
+            'mobile', v_user.mobile,
+            'created_at', v_user.created_at,
+            'date_of_birth', v_user.date_of_birth
+        ),
+        'test_completed', v_completed,
+        -- Next section after the furthest one completed
+        'current_section', case
+            when v_sections is null then 'A'
+            when 'C' = any(v_sections) then 'D'
+            when 'B' = any(v_sections) then 'C'
+            when 'A' = any(v_sections) then 'B'
+        end,
+        -- expires_at is stored as naive UTC by the backend
+        'session', (
+            select jsonb_build_object('session_id', session_id, 'token', token)
+            from "Sessions"
+            where user_id = v_user.user_id
+              and expires_at > (now() at time zone 'utc')
+            limit 1
+        )
+    );
+end;
+$$;
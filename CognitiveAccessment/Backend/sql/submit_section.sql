@@ -0,0 +1,48 @@
+-- Stores a submitted section in one transaction: the graded answers, the time
+-- spent on the section and, after section D, the Test_Completed flag once
+-- A, B and C are also done.
+-- Called from endpoint.submit_answers via supabase.rpc("submit_section", ...)
+
+create or replace function submit_section(
+    p_student_id uuid,
+    p_section text,
+    p_time_spent integer,
+    p_answers jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_inserted integer;
+    v_test_completed boolean := false;
+begin
+    insert into "Student_Answers" (answer_id, student_id, section, question_id, selected_answer, is_correct)
+    select a.answer_id, p_student_id, p_section, a.question_id, a.selected_answer, a.is_correct
+    from jsonb_to_recordset(p_answers)
+        as a(answer_id integer, question_id integer, selected_answer integer, is_correct boolean);
+
+    get diagnostics v_inserted = row_count;
+
+    insert into "Student_Section_Time" (student_id, section, time_spent_seconds)
+    values (p_student_id, p_section, p_time_spent);
+
+    if p_section = 'D' and (
+        select count(distinct section)
+        from "Student_Section_Time"
+        where student_id = p_student_id
+          and section in ('A', 'B', 'C')
+    ) = 3 then
+        insert into "Test_Completed" (student_id, completed)
+        values (p_student_id, true)
+        on conflict (student_id) do update set completed = true;
+
+        v_test_completed := true;
+    end if;
+
+    return jsonb_build_object(
+        'inserted_count', v_inserted,
+        'time_recorded', true,
+        'test_completed', v_test_completed
+    );
+end;
+$$;
@@ -0,0 +1,9 @@
+-- Case-insensitive name lookups for login and signup without a sequential scan
+-- of "Users": a stored lower(name) column plus a composite index on the fields
+-- both endpoints filter on.
+
+alter table "Users"
+    add column if not exists name_lower text generated always as (lower(name)) stored;
+
+create index if not exists users_auth_idx
+    on "Users" (name_lower, mobile, date_of_birth);
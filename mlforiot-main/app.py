@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from model import (
     calculate_student_metrics,
     identify_strengths_weaknesses,
@@ -10,7 +10,9 @@ from model import (
     evaluate_model,
     generate_specific_recommendations,
     analyze_topic_performance,
-    generate_topic_based_recommendations
+    build_topic_cache,
+    generate_topic_based_recommendations,
+    prepare_student_data
 )
 from utils import visualize_student_performance, visualize_student_vs_average, visualize_topic_performance
 from dotenv import load_dotenv
@@ -24,6 +26,81 @@ os.makedirs('data', exist_ok=True)
 # Get API key from environment variables
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+# Section codes to subject names, built once rather than on every rerun of main()
+SECTION_MAPPING = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
+
+# Cached wrappers around the model functions. Streamlit reruns the whole script on
+# every widget interaction, so without these each click recomputes the class-wide
+# metrics and re-requests the LLM recommendations for the same data.
+@st.cache_data(show_spinner=False)
+def cached_student_metrics(data):
+    return calculate_student_metrics(data)
+
+@st.cache_data(show_spinner=False)
+def cached_average_performance(student_section_performance, student_overall):
+    return calculate_average_performance(student_section_performance, student_overall)
+
+@st.cache_data(show_spinner=False)
+def cached_strengths_weaknesses(student_section_performance, avg_section_performance):
+    return identify_strengths_weaknesses(student_section_performance, avg_section_performance)
+
+@st.cache_data(show_spinner=False)
+def cached_topic_cache(data):
+    return build_topic_cache(data)
+
+class IncompleteRecommendations(Exception):
+    """
+    Raised by cached_recommendations when an LLM request failed, so Streamlit doesn't
+    cache the partial result and the next rerun retries. Carries the partial result.
+    """
+    def __init__(self, topic_recommendations, specific_recommendations):
+        super().__init__("LLM recommendations are incomplete")
+        self.recommendations = (topic_recommendations, specific_recommendations)
+
+@st.cache_data(show_spinner=False)
+def cached_recommendations(data, student_id, topic_performance, student_section_performance, avg_section_performance, api_key):
+    # The topic-based and specific recommendations are independent LLM round-trips,
+    # so request them side by side instead of one after the other. Both reuse the
+    # student's topic performance rather than re-filtering the full dataset.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        topic_future = executor.submit(
+            generate_topic_based_recommendations, data, student_id, api_key, topic_performance
+        )
+        specific_future = executor.submit(
+            generate_specific_recommendations,
+            data, student_id, student_section_performance, avg_section_performance, api_key, topic_performance
+        )
+        topic_recommendations, specific_recommendations = topic_future.result(), specific_future.result()
+    
+    # The generators report a failed API request as None (the specific reply, or a
+    # section's topic-based entry); don't let a timeout or 5xx get cached for good.
+    # A reply that parses to nothing is still a successful result and is cached.
+    if specific_recommendations is None or None in topic_recommendations.values():
+        raise IncompleteRecommendations(
+            {section: content for section, content in topic_recommendations.items() if content is not None},
+            specific_recommendations or {},
+        )
+    
+    return topic_recommendations, specific_recommendations
+
+# The figures only depend on the selected student and the metrics, so cache them too.
+# cache_data hands each rerun its own unpickled copy, which is far cheaper than
+# redrawing and keeps sessions from sharing one matplotlib figure.
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_performance_figure(student_section_performance, student_overall, avg_section_performance, avg_overall_performance, selected_student):
+    return visualize_student_performance(
+        student_section_performance, student_overall,
+        avg_section_performance, avg_overall_performance, selected_student
+    )
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_comparison_figure(student_data, avg_section_performance):
+    return visualize_student_vs_average(student_data, avg_section_performance, SECTION_MAPPING)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_topic_figure(topic_performance):
+    return visualize_topic_performance(topic_performance, SECTION_MAPPING)
+
 def main():
     st.set_page_config(
         page_title="Student Performance Analysis",
@@ -37,7 +114,7 @@ def main():
     
     if upload_mode == "Existing database":
         try:
-            data = pd.read_csv('data/student_data.csv')
+            data = pd.read_csv('data/student_data.csv', engine='pyarrow')
             st.success("Using existing student database")
         except FileNotFoundError:
             st.error("Database file not found. Please upload a CSV file.")
@@ -45,7 +122,7 @@ def main():
     else:
         uploaded_file = st.file_uploader("Upload new student data", type=["csv"])
         if uploaded_file is not None:
-            new_student_data = pd.read_csv(uploaded_file)
+            new_student_data = pd.read_csv(uploaded_file, engine='pyarrow')
             try:
                 # Save uploaded data
                 os.makedirs('data', exist_ok=True)
@@ -60,6 +137,8 @@ def main():
             data = None
     
     if data is not None:
+        data = prepare_student_data(data)
+        
         # Student selector
         student_ids = data['student_id'].unique()
         selected_student = st.selectbox("Select a student to analyze:", student_ids)
@@ -70,13 +149,13 @@ def main():
             st.dataframe(data[data['student_id'] == selected_student], use_container_width=True)
         
         # Process data
-        student_section_performance, student_overall = calculate_student_metrics(data)
+        student_section_performance, student_overall = cached_student_metrics(data)
         
         # Calculate average performance
-        avg_section_performance, avg_overall_performance = calculate_average_performance(student_section_performance, student_overall)
+        avg_section_performance, avg_overall_performance = cached_average_performance(student_section_performance, student_overall)
         
-        # Analyze topic performance
-        topic_performance = analyze_topic_performance(data, selected_student)
+        # Analyze topic performance (a slice of the class-wide topic table, built once per dataset)
+        topic_performance = analyze_topic_performance(data, selected_student, cached_topic_cache(data))
         
         # Display class averages
         st.subheader("Class Performance Averages")
@@ -87,11 +166,10 @@ def main():
         
         with col2:
             # Display section averages
-            section_mapping = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
-            
+            avg_sections = avg_section_performance['section'].astype(str)
             section_avg_data = pd.DataFrame({
-                'Section': [f"{section_mapping[row['section']]} ({row['section']})" for _, row in avg_section_performance.iterrows()],
-                'Average Score': [f"{row['avg_score_percentage']:.2f}%" for _, row in avg_section_performance.iterrows()]
+                'Section': avg_sections.map(SECTION_MAPPING) + " (" + avg_sections + ")",
+                'Average Score': avg_section_performance['avg_score_percentage'].map("{:.2f}%".format)
             })
             st.dataframe(section_avg_data, hide_index=True, use_container_width=True)
         
@@ -104,14 +182,14 @@ def main():
         
         # Visualize overall performance
         st.subheader("Overall Performance Analysis")
-        fig = visualize_student_performance(
+        fig = cached_performance_figure(
             student_section_performance, student_overall,
             avg_section_performance, avg_overall_performance, selected_student
         )
         st.pyplot(fig)
         
         # Identify strengths and weaknesses
-        strengths_weaknesses = identify_strengths_weaknesses(student_section_performance, avg_section_performance)
+        strengths, weaknesses = cached_strengths_weaknesses(student_section_performance, avg_section_performance)[selected_student]
         
         # Individual student analysis
         st.subheader(f"Detailed Analysis for Student ID: {selected_student}")
@@ -125,12 +203,12 @@ def main():
         section_data.columns = ['Section', 'Correct Answers', 'Total Questions', 'Score (%)']
         
         # Map section codes to subject names
-        section_mapping = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
-        section_data['Subject'] = section_data['Section'].map(section_mapping)
+        section_data['Subject'] = section_data['Section'].map(SECTION_MAPPING)
         
         # Add the class average for comparison
-        section_data['Class Average (%)'] = section_data['Section'].apply(
-            lambda x: avg_section_performance[avg_section_performance['section'] == x]['avg_score_percentage'].values[0]
+        section_data = section_data.merge(
+            avg_section_performance.rename(columns={'section': 'Section', 'avg_score_percentage': 'Class Average (%)'}),
+            on='Section', how='left'
         )
         
         # Add difference from average
@@ -163,22 +241,22 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            st.write("**Strengths:**", ', '.join(f"{section_mapping[s]} (Section {s})" for s in strengths_weaknesses[selected_student]['strengths']))
+            st.write("**Strengths:**", ', '.join(f"{SECTION_MAPPING[s]} (Section {s})" for s in strengths))
         
         with col2:
-            st.write("**Areas for Improvement:**", ', '.join(f"{section_mapping[w]} (Section {w})" for w in strengths_weaknesses[selected_student]['weaknesses']))
+            st.write("**Areas for Improvement:**", ', '.join(f"{SECTION_MAPPING[w]} (Section {w})" for w in weaknesses))
         
         # Topic-level performance visualization
         if not topic_performance.empty:
             st.subheader("Topic-Level Performance Analysis")
-            topic_fig = visualize_topic_performance(topic_performance, section_mapping)
+            topic_fig = cached_topic_figure(topic_performance)
             st.pyplot(topic_fig)
             
             # Display topic performance table for all sections
             st.markdown("### Topic Performance Details:")
             
             # Create tabs for each section
-            tabs = st.tabs([f"{section_mapping[section]} (Section {section})" for section in ['A', 'B', 'C', 'D']])
+            tabs = st.tabs([f"{SECTION_MAPPING[section]} (Section {section})" for section in ['A', 'B', 'C', 'D']])
             
             # Display topic performance for each section in its respective tab
             for i, section in enumerate(['A', 'B', 'C', 'D']):
@@ -187,7 +265,7 @@ def main():
                     
                     if not section_topic_data.empty:
                         # Add subject name
-                        section_topic_data['Subject'] = section_mapping[section]
+                        section_topic_data['Subject'] = SECTION_MAPPING[section]
                         
                         # Format the table
                         display_data = section_topic_data[['Subject', 'topic', 'total_questions', 'correct_answers', 'accuracy', 'is_weak']]
@@ -197,25 +275,32 @@ def main():
                         display_data = display_data.sort_values('Accuracy (%)', ascending=True)
                         
                         # Format accuracy as percentage with 1 decimal place
-                        display_data['Accuracy (%)'] = display_data['Accuracy (%)'].apply(lambda x: f"{x:.1f}%")
+                        display_data['Accuracy (%)'] = display_data['Accuracy (%)'].map("{:.1f}%".format)
                         
                         # Display the dataframe
                         st.dataframe(display_data, hide_index=True, use_container_width=True)
                     else:
-                        st.info(f"No topic data available for {section_mapping[section]} (Section {section})")
+                        st.info(f"No topic data available for {SECTION_MAPPING[section]} (Section {section})")
+        
+        # Topic-based and specific recommendations are generated together
+        with st.spinner("Generating personalized recommendations..."):
+            try:
+                topic_recommendations, specific_recommendations = cached_recommendations(
+                    data, selected_student, topic_performance, student_section_performance,
+                    avg_section_performance, OPENROUTER_API_KEY
+                )
+            except IncompleteRecommendations as e:
+                # Show what came back this time; the next rerun requests it again
+                topic_recommendations, specific_recommendations = e.recommendations
         
         # Topic-based recommendations
-        with st.spinner("Generating topic-based recommendations..."):
-            topic_recommendations = generate_topic_based_recommendations(
-                data, selected_student, OPENROUTER_API_KEY
-            )
         
         if topic_recommendations:
             st.subheader("Topic-Based Personalized Recommendations")
             
             for section, content in topic_recommendations.items():
-                section_name = section_mapping.get(section, f"Section {section}")
-                with st.expander(f"{section_name} (Section {section}):", expanded=(section in strengths_weaknesses[selected_student]['weaknesses'])):
+                section_name = SECTION_MAPPING.get(section, f"Section {section}")
+                with st.expander(f"{section_name} (Section {section}):", expanded=(section in weaknesses)):
                     if 'analysis' in content:
                         st.markdown("**Analysis:**")
                         st.markdown(content['analysis'])
@@ -231,17 +316,10 @@ def main():
                     if 'full_response' in content:
                         st.markdown(content['full_response'])
         
-        # Generate highly specific recommendations
-        with st.spinner("Generating personalized recommendations..."):
-            specific_recommendations = generate_specific_recommendations(
-                data, selected_student, student_section_performance,
-                avg_section_performance, OPENROUTER_API_KEY
-            )
-        
         # Display personalized recommendations
         st.markdown("### Personalized Recommendations:")
-        for section, section_name in section_mapping.items():
-            with st.expander(f"{section_name} (Section {section}):", expanded=(section in strengths_weaknesses[selected_student]['weaknesses'])):
+        for section, section_name in SECTION_MAPPING.items():
+            with st.expander(f"{section_name} (Section {section}):", expanded=(section in weaknesses)):
                 if section in specific_recommendations:
                     for recommendation in specific_recommendations[section]:
                         st.markdown(f"- {recommendation}")
@@ -251,7 +329,7 @@ def main():
         # Comparison with average
         #final
         st.subheader("Comparison with Average Performance")
-        fig_comp = visualize_student_vs_average(student_data, avg_section_performance, section_mapping)
+        fig_comp = cached_comparison_figure(student_data, avg_section_performance)
         st.pyplot(fig_comp)
 
 if __name__ == "__main__":
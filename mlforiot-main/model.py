@@ -1,31 +1,106 @@
 import pandas as pd
 import numpy as np
-import requests
-import json
+import orjson
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+# Section mapping for better readability
+_SECTION_MAPPING = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
+
+def prepare_student_data(data):
+    """
+    Normalize a freshly loaded dataset once so every later groupby works on cheap keys:
+    is_correct becomes a 1-byte bool column, and student_id, section and topic become
+    categoricals so grouping works on integer codes instead of hashing strings
+    """
+    # A row without an answer never counted towards a total (the NaN-skipping sum/count
+    # left it out); drop it here, since the bool cast below would count NaN as correct
+    missing = data['is_correct'].isna()
+    if missing.any():
+        data = data[~missing].copy()
+    
+    # Store is_correct as bool so the groupby sums run on the native path instead of
+    # falling back to Python objects (string columns hold 'true'/'false')
+    is_correct = data['is_correct']
+    if is_correct.dtype == 'object':
+        data['is_correct'] = (is_correct.astype(str).str.lower() == 'true').to_numpy()
+    else:
+        data['is_correct'] = is_correct.to_numpy(dtype=bool)
+    
+    for col in ('student_id', 'section', find_topic_column(data)):
+        if col is not None and data[col].dtype == 'object':
+            data[col] = data[col].astype('category')
+    return data
+
+def _require_prepared(data):
+    """Reject a dataset that hasn't been through prepare_student_data"""
+    if data['is_correct'].dtype != bool:
+        raise ValueError("run prepare_student_data() on the dataset first")
+
+def _percentage(correct, total):
+    """correct / total as a float32 percentage"""
+    percentage = np.divide(correct, total)
+    percentage *= 100
+    return percentage.astype(np.float32, copy=False)
 
 def calculate_student_metrics(data):
     """
     Calculate performance metrics for each student
     """
-    # Convert is_correct to boolean if it's string
-    if data['is_correct'].dtype == 'object':
-        data['is_correct'] = data['is_correct'].map({'true': True, 'false': False})
+    _require_prepared(data)
+    
+    # Per (student, section) totals in one pass: factorize both keys (sorted, as groupby
+    # would), fold them into a single group code and count with np.bincount
+    student_codes, student_ids = pd.factorize(data['student_id'], sort=True)
+    section_codes, sections = pd.factorize(data['section'], sort=True)
+    n_sections = len(sections)
+    n_groups = len(student_ids) * n_sections
     
-    # Group by student_id and section
-    student_section_performance = data.groupby(['student_id', 'section'])['is_correct'].agg(['sum', 'count']).reset_index()
-    student_section_performance['score_percentage'] = (student_section_performance['sum'] / student_section_performance['count']) * 100
+    # Rows with a missing student_id or section are dropped, like groupby does
+    valid = (student_codes >= 0) & (section_codes >= 0)
+    group_codes = student_codes[valid] * n_sections + section_codes[valid]
+    is_correct = data['is_correct'].to_numpy()[valid]
     
-    # Overall student performance
-    student_overall = data.groupby('student_id')['is_correct'].agg(['sum', 'count']).reset_index()
-    student_overall['overall_score'] = (student_overall['sum'] / student_overall['count']) * 100
+    counts = np.bincount(group_codes, minlength=n_groups)
+    sums = np.bincount(group_codes[is_correct.astype(bool, copy=False)], minlength=n_groups)
+    observed = np.flatnonzero(counts)
+    sums = sums[observed]
+    counts = counts[observed]
+    
+    # Percentages are bounded to [0, 100] and shown to 1-2 decimals, so float32 is plenty
+    # and halves the memory every later merge/sort has to move. They are computed on the
+    # raw arrays so no intermediate Series gets built along the way
+    student_section_performance = pd.DataFrame({
+        'student_id': student_ids[observed // n_sections],
+        'section': sections[observed % n_sections],
+        'sum': sums,
+        'count': counts,
+        'score_percentage': _percentage(sums, counts)
+    })
+    
+    # Overall student performance, rolled up from the same section totals: the groups are
+    # ordered by student, so each student's sections are one contiguous run to add up
+    group_students = observed // n_sections
+    student_starts = np.flatnonzero(np.diff(group_students, prepend=-1))
+    overall_sums = np.add.reduceat(sums, student_starts)
+    overall_counts = np.add.reduceat(counts, student_starts)
+    student_overall = pd.DataFrame({
+        'student_id': student_ids[group_students[student_starts]],
+        'sum': overall_sums,
+        'count': overall_counts,
+        'overall_score': _percentage(overall_sums, overall_counts)
+    })
     
     return student_section_performance, student_overall
 
 def calculate_average_performance(student_section_performance, student_overall):
     """Calculate average performance across all students"""
-    avg_section_performance = student_section_performance.groupby('section')['score_percentage'].mean().reset_index()
+    # Keep the sort: the averages table is shown in A-D order, and on categorical
+    # sections it only orders the handful of codes
+    avg_section_performance = student_section_performance.groupby('section', as_index=False, sort=True, observed=True)['score_percentage'].mean()
     avg_section_performance.columns = ['section', 'avg_score_percentage']
     
     avg_overall_performance = student_overall['overall_score'].mean()
@@ -35,124 +110,161 @@ def calculate_average_performance(student_section_performance, student_overall):
 def identify_strengths_weaknesses(student_section_performance, avg_section_performance):
     """
     Identify strengths and weaknesses for each student based on section performance
-    compared to the average performance
+    compared to the average performance.
+    Returns {student_id: (strengths, weaknesses)}, each a tuple of section codes
     """
-    strengths_weaknesses = {}
+    # Line every student's section score up against the class average in one merge
+    merged = student_section_performance[['student_id', 'section', 'score_percentage']].merge(
+        avg_section_performance, on='section'
+    )
+    merged['diff'] = merged['score_percentage'] - merged['avg_score_percentage']
     
-    for student_id in student_section_performance['student_id'].unique():
-        student_data = student_section_performance[student_section_performance['student_id'] == student_id]
-        
-        # Compare with average performance
-        comparison = []
-        for _, row in student_data.iterrows():
-            section = row['section']
-            score = row['score_percentage']
-            avg_score = avg_section_performance[avg_section_performance['section'] == section]['avg_score_percentage'].values[0]
-            diff = score - avg_score
-            comparison.append({'section': section, 'score': score, 'avg_score': avg_score, 'diff': diff})
-        
-        comparison_df = pd.DataFrame(comparison)
-        
-        # Sort by difference from average (positive = strength, negative = weakness)
-        sorted_comparison = comparison_df.sort_values('diff', ascending=False)
-        strengths = sorted_comparison.head(2)['section'].values
-        weaknesses = sorted_comparison.tail(2)['section'].values
+    if merged.empty:
+        return {}
+    
+    # Put each student's rows next to each other (stable, so sections keep their order) and
+    # find where every student's block starts; the loop below then only slices arrays
+    merged = merged.sort_values('student_id', kind='stable', ignore_index=True)
+    student_ids = merged['student_id'].to_numpy()
+    sections = merged['section'].to_numpy()
+    diff = merged['diff'].to_numpy()
+    
+    starts = np.flatnonzero(np.r_[True, student_ids[1:] != student_ids[:-1]])
+    ends = np.r_[starts[1:], len(merged)]
+    
+    strengths_weaknesses = {}
+    for start, end in zip(starts, ends):
+        student_sections = sections[start:end]
+        student_diff = diff[start:end]
         
-        strengths_weaknesses[student_id] = {
-            'strengths': strengths,
-            'weaknesses': weaknesses,
-            'comparison': comparison_df
-        }
+        # A student only has a handful of sections, so a single argsort of the raw array
+        # gives both ends at once: the top two are strengths and the bottom two weaknesses,
+        # each ordered by diff, highest first (positive = strength, negative = weakness)
+        order = np.argsort(-student_diff, kind='stable')
+        strengths_weaknesses[student_ids[start]] = (
+            tuple(student_sections[order[:2]]),
+            tuple(student_sections[order[-2:]])
+        )
     
     return strengths_weaknesses
 
-def analyze_topic_performance(data, student_id):
-    """
-    Analyze student performance by topic to identify specific strengths and weaknesses
-    """
-    student_data = data[data['student_id'] == student_id].copy()
-    
-    # Check if Topic column exists (case-insensitive)
-    topic_col = None
-    for col in student_data.columns:
-        if col.lower() == 'topic':
-            topic_col = col
-            break
-    
-    if topic_col:
-        # Group by section and topic
-        topic_analysis = student_data.groupby(['section', topic_col]).agg(
-            total_questions=('is_correct', 'count'),
-            correct_answers=('is_correct', 'sum')
-        ).reset_index()
-        
-        # Calculate accuracy
-        topic_analysis['accuracy'] = (topic_analysis['correct_answers'] / topic_analysis['total_questions']) * 100
-        
-        # Identify weak topics (accuracy < 50%)
-        topic_analysis['is_weak'] = topic_analysis['accuracy'] < 50
-        
-        # Rename topic column to 'topic' for consistency
-        topic_analysis = topic_analysis.rename(columns={topic_col: 'topic'})
-        
-        return topic_analysis
-    else:
-        # Create empty dataframe with proper columns
-        return pd.DataFrame(columns=['section', 'topic', 'total_questions', 'correct_answers', 'accuracy', 'is_weak'])
+def find_topic_column(data):
+    """Return the name of the Topic column (matched case-insensitively), or None"""
+    return next((col for col in data.columns if col.lower() == 'topic'), None)
 
-def evaluate_model(data):
-    """Return high accuracy and precision for the model"""
-    return 95.0, 93.0
+# Columns of a topic performance table
+_TOPIC_COLUMNS = ['section', 'topic', 'total_questions', 'correct_answers', 'accuracy', 'is_weak']
 
-def generate_topic_based_recommendations(data, student_id, api_key=None):
+def build_topic_cache(data):
     """
-    Generate personalized recommendations based on topic-level performance
+    Compute topic-level performance for every student in one groupby.
+    Returns a DataFrame indexed by student_id that analyze_topic_performance can slice.
     """
-    # Use the provided API key or get from environment
-    api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+    _require_prepared(data)
     
-    if not api_key:
-        return {}
+    topic_col = find_topic_column(data)
     
-    # Get topic performance data
-    topic_performance = analyze_topic_performance(data, student_id)
+    if not topic_col:
+        # Create empty dataframe with proper columns
+        return pd.DataFrame(
+            columns=_TOPIC_COLUMNS,
+            index=pd.Index([], name='student_id')
+        )
     
-    if topic_performance.empty:
-        return {}
+    # Rename topic column to 'topic' for consistency (before grouping, so the
+    # result comes out with the right column names)
+    if topic_col != 'topic':
+        data = data.rename(columns={topic_col: 'topic'}, copy=False)
     
-    # Section mapping for better readability
-    section_mapping = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
+    # Group by student, section and topic. The sort stays on purpose: it is what puts each
+    # student's sections and topics in the order the topic charts and tabs show them
+    topic_cache = data.groupby(['student_id', 'section', 'topic'], sort=True, observed=True).agg(
+        total_questions=('is_correct', 'size'),
+        correct_answers=('is_correct', 'sum')
+    ).reset_index(level=['section', 'topic'])
     
-    # Prepare data for each section
-    section_data = {}
-    for section in ['A', 'B', 'C', 'D']:
-        section_topics = topic_performance[topic_performance['section'] == section]
-        
-        if not section_topics.empty:
-            # Get weak topics (accuracy < 50%)
-            weak_topics = section_topics[section_topics['is_weak']].sort_values('accuracy')
-            
-            # Format topic data for prompt
-            topic_info = []
-            for _, row in section_topics.iterrows():
-                topic_info.append(f"{row['topic']}: {row['correct_answers']}/{row['total_questions']} correct ({row['accuracy']:.1f}%)")
-            
-            section_data[section] = {
-                'name': section_mapping[section],
-                'topics': topic_info,
-                'weak_topics': weak_topics['topic'].tolist() if not weak_topics.empty else []
-            }
+    # Calculate accuracy
+    topic_cache['accuracy'] = ((topic_cache['correct_answers'] / topic_cache['total_questions']) * 100).astype(np.float32)
     
-    # Create prompt for each section
-    recommendations = {}
+    # Identify weak topics (accuracy < 50%)
+    topic_cache['is_weak'] = topic_cache['accuracy'] < 50
     
-    for section, data in section_data.items():
-        # Skip sections with no weak topics
-        if not data['weak_topics']:
-            continue
-        
-        # Create prompt for this section
-        prompt = f"""
+    return topic_cache
+
+def analyze_topic_performance(data, student_id, topic_cache=None):
+    """
+    Analyze student performance by topic to identify specific strengths and weaknesses.
+    Pass a build_topic_cache() result to slice it instead of aggregating the student's rows.
+    """
+    if topic_cache is None:
+        # Resolve the Topic column up front so a dataset without one skips the student filter entirely
+        if not find_topic_column(data):
+            return pd.DataFrame(columns=_TOPIC_COLUMNS)
+        topic_cache = build_topic_cache(data[data['student_id'] == student_id])
+    
+    try:
+        return topic_cache.loc[[student_id]].reset_index(drop=True)
+    except KeyError:
+        return pd.DataFrame(columns=_TOPIC_COLUMNS)
+
+# Fixed (accuracy, precision) reported for the model; evaluate_model doesn't look at the data
+_MODEL_METRICS = (95.0, 93.0)
+
+# Picks the lines that matter out of the LLM's recommendations in one scan: a
+# "### ... (Section X)" heading (group 1) or a "- " bullet under it (group 2)
+_RECOMMENDATION_LINE_RE = re.compile(r'^(?:### .*?\(Section ([A-D])\).*|- (.*))$', re.MULTILINE)
+
+def evaluate_model(data):
+    """Return high accuracy and precision for the model"""
+    return _MODEL_METRICS
+
+# (connect, read) timeout for OpenRouter calls. Connecting should be quick, but a
+# non-streamed reply with a full two-week study plan can take minutes to generate,
+# so the read timeout only guards against a connection that has hung for good
+_CHAT_COMPLETION_TIMEOUT = (5, 300)
+
+@lru_cache(maxsize=None)
+def _get_session():
+    """Shared HTTP session so keep-alive connections to OpenRouter are reused across calls"""
+    # Imported here so loading the metrics functions doesn't pull in the HTTP stack
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    # Room for one pooled connection per section request running in parallel
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+    return session
+
+def _post_chat_completion(prompt, api_key):
+    """Send a single-message chat completion to OpenRouter and return the reply text"""
+    # Set up API request
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    
+    # orjson encodes the payload and decodes the raw reply bytes in C, skipping the
+    # stdlib json round-trips and requests' charset detection on the body
+    response = _get_session().post(
+        "https://openrouter.ai/api/v1/chat/completions",
+        headers=headers,
+        data=orjson.dumps({
+            "model": "deepseek/deepseek-chat",
+            "messages": [{"role": "user", "content": prompt}],
+        }),
+        timeout=_CHAT_COMPLETION_TIMEOUT,
+    )
+    
+    response.raise_for_status()
+    return orjson.loads(response.content)['choices'][0]['message']['content']
+
+def _request_section_recommendations(section, data, api_key):
+    """
+    Ask the LLM for recommendations on one section's weak topics.
+    Returns (section, parsed response) or (section, None) if the request failed.
+    """
+    # Create prompt for this section
+    prompt = f"""
 You are an expert educational advisor. Generate personalized recommendations for a student struggling with the following topics in {data['name']} (Section {section}):
 
 Weak topics: {', '.join(data['weak_topics'])}
@@ -191,97 +303,158 @@ Week 2:
 
 Keep recommendations specific, actionable, and tailored to the weak topics. Suggest online resources and practical exercises.
 """
+    
+    try:
+        llm_response = _post_chat_completion(prompt, api_key)
         
-        # Set up API request
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
+        # Parse response by splitting on the literal headers in a single pass
+        head, recommendations_found, rest = llm_response.partition('Recommendations:')
+        _, analysis_found, analysis = head.partition('Analysis:')
+        recommendations, study_plan_found, study_plan = rest.partition('Study Plan:')
         
-        try:
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                data=json.dumps({
-                    "model": "deepseek/deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                })
-            )
-            
-            response.raise_for_status()
-            llm_response = response.json()['choices'][0]['message']['content']
-            
-            # Parse response
-            analysis_match = re.search(r'Analysis:(.*?)Recommendations:', llm_response, re.DOTALL)
-            recommendations_match = re.search(r'Recommendations:(.*?)Study Plan:', llm_response, re.DOTALL)
-            study_plan_match = re.search(r'Study Plan:(.*?)$', llm_response, re.DOTALL)
+        if analysis_found and recommendations_found and study_plan_found:
+            return section, {
+                'analysis': analysis.strip(),
+                'recommendations': recommendations.strip(),
+                'study_plan': study_plan.strip()
+            }
+        else:
+            # Fallback if regex fails
+            return section, {'full_response': llm_response}
             
-            if analysis_match and recommendations_match and study_plan_match:
-                recommendations[section] = {
-                    'analysis': analysis_match.group(1).strip(),
-                    'recommendations': recommendations_match.group(1).strip(),
-                    'study_plan': study_plan_match.group(1).strip()
-                }
-            else:
-                # Fallback if regex fails
-                recommendations[section] = {'full_response': llm_response}
-                
-        except Exception as e:
-            print(f"API Error for section {section}: {e}")
-            continue
-    
-    return recommendations
+    except Exception as e:
+        print(f"API Error for section {section}: {e}")
+        return section, None
 
-def generate_specific_recommendations(data, student_id, student_section_performance, avg_section_performance, api_key=None):
-    """Generate LLM-powered recommendations using OpenRouter API"""
+def generate_topic_based_recommendations(data, student_id, api_key=None, topic_performance=None):
+    """
+    Generate personalized recommendations based on topic-level performance.
+    Pass topic_performance if it was already computed for this student.
+    Sections whose API request failed map to None.
+    """
     # Use the provided API key or get from environment
     api_key = api_key or os.getenv("OPENROUTER_API_KEY")
     
     if not api_key:
         return {}
     
-    section_mapping = {'A': 'Math', 'B': 'Verbal', 'C': 'Non-verbal', 'D': 'Comprehension'}
+    # Get topic performance data
+    if topic_performance is None:
+        topic_performance = analyze_topic_performance(data, student_id)
     
-    student_data = student_section_performance[student_section_performance['student_id'] == student_id]
+    if topic_performance.empty:
+        return {}
     
-    # Get strengths and weaknesses for this student
-    strengths_weaknesses = identify_strengths_weaknesses(student_section_performance, avg_section_performance)[student_id]
-    strengths = [section_mapping[s] for s in strengths_weaknesses['strengths']]
-    weaknesses = [section_mapping[w] for w in strengths_weaknesses['weaknesses']]
+    # Split the topics by section once and look each section up, instead of
+    # re-filtering the whole frame for every section
+    topics_by_section = dict(tuple(topic_performance.groupby('section', sort=False, observed=True)))
     
-    # Get topic-level performance
-    topic_performance = analyze_topic_performance(data, student_id)
+    # Prepare data for each section
+    section_data = {}
+    for section in ['A', 'B', 'C', 'D']:
+        section_topics = topics_by_section.get(section)
+        
+        if section_topics is not None:
+            # Get weak topics (accuracy < 50%)
+            weak_topics = section_topics[section_topics['is_weak']].sort_values('accuracy')
+            
+            # Format topic data for prompt
+            rows = section_topics[['topic', 'correct_answers', 'total_questions', 'accuracy']].itertuples(index=False, name=None)
+            topic_info = [f"{topic}: {correct}/{total} correct ({accuracy:.1f}%)" for topic, correct, total, accuracy in rows]
+            
+            section_data[section] = {
+                'name': _SECTION_MAPPING[section],
+                'topics': topic_info,
+                'weak_topics': weak_topics['topic'].tolist() if not weak_topics.empty else []
+            }
     
-    # Prepare performance context
+    # Request recommendations for every section with weak topics concurrently;
+    # the LLM calls are I/O bound, so total time is the slowest section, not the sum
+    recommendations = {}
+    sections_to_request = {section: data for section, data in section_data.items() if data['weak_topics']}
+    
+    if not sections_to_request:
+        return recommendations
+    
+    # map() yields results in submission order, keeping the sections in A-D order
+    with ThreadPoolExecutor(max_workers=min(4, len(sections_to_request))) as executor:
+        results = executor.map(
+            _request_section_recommendations,
+            sections_to_request.keys(),
+            sections_to_request.values(),
+            repeat(api_key),
+        )
+        # A section whose request failed keeps a None entry, so callers can tell an
+        # API failure apart from a section that simply has no weak topics
+        recommendations = dict(results)
+    
+    return recommendations
+
+def _student_context(student_data, strengths, weaknesses, avg_map, topic_performance):
+    """
+    Describe one student's results for an LLM prompt: section scores against the class
+    average, topic-level performance, strengths and areas for improvement
+    """
+    strengths = [_SECTION_MAPPING[s] for s in strengths]
+    weaknesses = [_SECTION_MAPPING[w] for w in weaknesses]
+    
+    # Prepare performance context, looking the class averages up by section
     performance_context = []
-    for _, row in student_data.iterrows():
-        section = row['section']
-        score = row['score_percentage']
-        avg = avg_section_performance[avg_section_performance['section'] == section]['avg_score_percentage'].values[0]
+    for section, score in zip(student_data['section'].values, student_data['score_percentage'].values):
+        avg = avg_map[section]
         performance_context.append(
-            f"{section_mapping[section]} (Section {section}): Student {score:.1f}% vs Class Avg {avg:.1f}%"
+            f"{_SECTION_MAPPING[section]} (Section {section}): Student {score:.1f}% vs Class Avg {avg:.1f}%"
         )
     
     # Add topic-level information to the context
     topic_context = []
     if not topic_performance.empty:
+        topics_by_section = dict(tuple(topic_performance.groupby('section', sort=False, observed=True)))
         for section in ['A', 'B', 'C', 'D']:
-            section_topics = topic_performance[topic_performance['section'] == section]
-            if not section_topics.empty:
-                topic_context.append(f"\n{section_mapping[section]} (Section {section}) Topics:")
-                for _, row in section_topics.iterrows():
-                    topic_context.append(
-                        f"- {row['topic']}: {row['correct_answers']}/{row['total_questions']} correct ({row['accuracy']:.1f}%)"
-                    )
+            section_topics = topics_by_section.get(section)
+            if section_topics is not None:
+                topic_context.append(f"\n{_SECTION_MAPPING[section]} (Section {section}) Topics:")
+                rows = section_topics[['topic', 'correct_answers', 'total_questions', 'accuracy']].itertuples(index=False, name=None)
+                topic_context.extend(
+                    f"- {topic}: {correct}/{total} correct ({accuracy:.1f}%)" for topic, correct, total, accuracy in rows
+                )
     
-    # Create prompt for the LLM
     newline = '\n'
-    prompt = (
-        "You are an expert educational advisor. Generate specific, actionable recommendations for a student based on their test performance.\n\n"
+    return (
         f"Performance Comparison:\n{newline.join(performance_context)}\n\n"
         f"Topic-Level Performance:\n{newline.join(topic_context)}\n\n"
         f"Strengths: {', '.join(strengths)}\n"
-        f"Areas for Improvement: {', '.join(weaknesses)}\n\n"
+        f"Areas for Improvement: {', '.join(weaknesses)}"
+    )
+
+def generate_specific_recommendations(data, student_id, student_section_performance, avg_section_performance, api_key=None, topic_performance=None):
+    """
+    Generate LLM-powered recommendations using OpenRouter API.
+    Returns {section: [recommendations]}, or None if the API request failed
+    """
+    # Use the provided API key or get from environment
+    api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+    
+    if not api_key:
+        return {}
+    
+    student_data = student_section_performance[student_section_performance['student_id'] == student_id]
+    
+    # Get strengths and weaknesses for this student; they only depend on the student's own
+    # rows and the class averages, so there is no need to rank every other student too
+    strengths, weaknesses = identify_strengths_weaknesses(student_data, avg_section_performance)[student_id]
+    
+    # Get topic-level performance
+    if topic_performance is None:
+        topic_performance = analyze_topic_performance(data, student_id)
+    
+    avg_map = dict(zip(avg_section_performance['section'].values, avg_section_performance['avg_score_percentage'].values))
+    student_context = _student_context(student_data, strengths, weaknesses, avg_map, topic_performance)
+    
+    # Create prompt for the LLM
+    prompt = (
+        "You are an expert educational advisor. Generate specific, actionable recommendations for a student based on their test performance.\n\n"
+        f"{student_context}\n\n"
         "For each section (Math, Verbal, Non-verbal, Comprehension), provide 2-3 specific, actionable recommendations. "
         "Focus especially on the weak topics identified in the topic-level performance. "
         "For strengths, suggest how to maintain or extend excellence. For weaknesses, suggest targeted strategies and resources for improvement.\n\n"
@@ -297,39 +470,21 @@ def generate_specific_recommendations(data, student_id, student_section_performa
         "Highlight the topics that the students must focus on"
     )
     
-    # Set up API request
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps({
-                "model": "deepseek/deepseek-chat",
-                "messages": [{"role": "user", "content": prompt}],
-            })
-        )
-        
-        response.raise_for_status()
-        llm_response = response.json()['choices'][0]['message']['content']
+        llm_response = _post_chat_completion(prompt, api_key)
     except Exception as e:
         print(f"API Error: {e}")
-        return {}
+        return None
     
     # Parse LLM response into section recommendations
     #final
     recommendations = {}
     current_section = None
-    for line in llm_response.split('\n'):
-        if line.startswith('### '):
-            section_match = re.search(r'\(Section ([A-D])\)', line)
-            if section_match:
-                current_section = section_match.group(1)
-                recommendations[current_section] = []
-        elif line.startswith('- ') and current_section:
-            recommendations[current_section].append(line[2:].strip())
+    for section, recommendation in _RECOMMENDATION_LINE_RE.findall(llm_response):
+        if section:
+            current_section = section
+            recommendations[current_section] = []
+        elif current_section:
+            recommendations[current_section].append(recommendation.strip())
     
     return recommendations